@@ -0,0 +1,2 @@
+# typing_test.py matches pytest's *_test.py pattern but is the app, not a test module
+collect_ignore = ["typing_test.py"]
@@ -0,0 +1,162 @@
+import importlib
+import sqlite3
+
+import pytest
+
+pytest.importorskip("tkinter")
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """A TypingSpeedTest without a GUI, backed by an in-memory database."""
+    # The module opens typing_test.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    typing_test = importlib.import_module("typing_test")
+    
+    conn = sqlite3.connect(":memory:")
+    schema = typing_test.conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'ngram_stats'"
+    ).fetchone()[0]
+    conn.execute(schema)
+    monkeypatch.setattr(typing_test, "conn", conn)
+    monkeypatch.setattr(typing_test, "cursor", conn.cursor())
+    
+    test = typing_test.TypingSpeedTest.__new__(typing_test.TypingSpeedTest)
+    test.sample_texts = {'medium': ["aaaa zzz", "qqq xx", "bbb"]}
+    test.current_difficulty = 'medium'
+    test.sample_text = ""
+    test.typed_text = ""
+    test.key_times = []
+    test.ngram_stats = test.load_ngram_stats()
+    test.ngram_index = test.build_ngram_index()
+    return test
+
+
+def record(app, sample, typed, key_times=None):
+    app.sample_text = sample
+    app.typed_text = typed
+    app.key_times = key_times if key_times is not None else [float(i) for i in range(len(typed))]
+    app.update_ngram_stats()
+    return {ngram: stats[1] for ngram, stats in app.ngram_stats.items()}
+
+
+def test_extract_ngrams(app):
+    assert app.extract_ngrams("Ab") == ['a', 'b', 'ab']
+
+
+def test_partial_passage_ignores_untyped_tail(app):
+    errors = record(app, "abc def", "abc")
+    assert errors == {'a': 0, 'b': 0, 'c': 0, 'ab': 0, 'bc': 0}
+
+
+def test_cut_off_on_typo_ignores_untyped_tail(app):
+    errors = record(app, "the quick brown fox", "the quicj")
+    assert errors['k'] == 1
+    assert 'b' not in errors and 'r' not in errors
+    
+    # The stray 'x' must not be matched to the 'x' at the end of "fox"
+    errors = record(app, "the quick brown fox", "the quick brx")
+    assert errors['o'] == 1
+    assert 'w' not in errors and 'f' not in errors
+
+
+def test_cut_off_passage_does_not_drive_ranking(app):
+    for _ in range(3):
+        record(app, "aaaa zzz", "aaab")
+    assert 'z' not in app.weak_ngrams() and 'zz' not in app.weak_ngrams()
+    
+    app.sample_text = "bbb"
+    assert app.pick_adaptive_text() == "aaaa zzz"
+
+
+def test_case_error_counts(app):
+    errors = record(app, "The", "the")
+    assert errors['t'] == 1
+    assert errors['th'] == 1
+    assert errors['h'] == 0 and errors['he'] == 0
+
+
+def test_omitted_character_does_not_shift_later_errors(app):
+    errors = record(app, "abcdef", "acdef", [0.0, 1.0, 2.0, 3.5, 4.0])
+    assert errors['b'] == 1 and errors['ab'] == 1 and errors['bc'] == 1
+    assert all(errors[n] == 0 for n in ('c', 'd', 'e', 'f', 'cd', 'de', 'ef'))
+    
+    # Intervals belong to the right characters; 'c' follows a gap so is untimed
+    assert app.ngram_stats['c'][2] == 0
+    assert app.ngram_stats['e'][3] == pytest.approx(1.5)
+    assert app.ngram_stats['f'][3] == pytest.approx(0.5)
+
+
+def test_pauses_are_not_recorded_as_slow_keys(app):
+    record(app, "abc", "abc", [0.0, 0.2, 20.2])
+    assert app.ngram_stats['b'][2:] == [1, pytest.approx(0.2)]
+    assert app.ngram_stats['c'][2:] == [0, 0.0]
+
+
+def test_slowness_weight_is_capped(app):
+    # One huge interval already stored (e.g. from before pauses were dropped)
+    app.ngram_stats = {'a': [5, 0, 5, 1.0], 'b': [5, 0, 5, 1.0], 'c': [5, 0, 1, 20.0]}
+    assert app.weak_ngrams() == {'c': 1.0}
+    
+    # A slow key can't outweigh one that is mistyped every time and also slow
+    app.ngram_stats['d'] = [5, 5, 1, 20.0]
+    weak = app.weak_ngrams()
+    assert weak['d'] == pytest.approx(2.0)
+    assert max(weak, key=weak.get) == 'd'
+
+
+def test_stats_persist_incrementally(app):
+    record(app, "ab", "xb")
+    record(app, "ab", "ab")
+    assert app.load_ngram_stats()['a'][:2] == [2, 1]
+
+
+def test_weak_ngrams_require_min_attempts(app):
+    record(app, "q", "w")
+    assert app.weak_ngrams() == {}
+    for _ in range(2):
+        record(app, "q", "w")
+    assert app.weak_ngrams() == {'q': 1.0}
+
+
+def test_rank_passages_prefers_dense_weak_ngrams(app):
+    ranked = app.rank_passages({'qq': 1.0, 'a': 0.5})
+    assert [pid for _, pid in ranked] == [1, 0]
+    
+    app.sample_text = "qqq xx"
+    assert [pid for _, pid in app.rank_passages({'qq': 1.0})] == []
+
+
+def test_rank_passages_skips_common_ngrams_and_keeps_top_k(app):
+    app.sample_texts = {'medium': ["the cat", "the dog", "the owl", "zebra"]}
+    app.ngram_index = app.build_ngram_index()
+    
+    # 'th' is in most passages, so it can't choose between them
+    assert app.rank_passages({'th': 1.0}) == []
+    assert [pid for _, pid in app.rank_passages({'th': 1.0, 'ze': 0.1})] == [3]
+    assert len(app.rank_passages({'c': 1.0, 'd': 1.0, 'w': 1.0}, top_k=2)) == 2
+
+
+def test_toggling_adaptive_keeps_passage_of_running_test(app, monkeypatch):
+    monkeypatch.setattr(app, "display_sample_text", lambda: None, raising=False)
+    app.adaptive_var = type("Var", (), {"get": lambda self: True})()
+    app.ngram_stats = {'qq': [10, 5, 0, 0.0]}
+    app.sample_text = "bbb"
+    
+    app.running = True
+    app.toggle_adaptive()
+    assert app.sample_text == "bbb"
+    
+    app.running = False
+    app.toggle_adaptive()
+    assert app.sample_text == "qqq xx"
+
+
+def test_pick_adaptive_text_falls_back_to_characters(app):
+    assert app.pick_adaptive_text() is None
+    
+    app.ngram_stats = {'z': [10, 5, 0, 0.0]}
+    assert app.pick_adaptive_text() == "aaaa zzz"
+    
+    app.ngram_stats = {'qq': [10, 5, 0, 0.0], 'z': [10, 9, 0, 0.0]}
+    assert app.pick_adaptive_text() == "qqq xx"
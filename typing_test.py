@@ -4,8 +4,9 @@ import time
 import sqlite3
 import random
 import string
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import difflib
+import heapq
+import math
 from datetime import datetime
 import csv
 import os
@@ -24,6 +25,15 @@ CREATE TABLE IF NOT EXISTS results (
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
 )
 """)
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS ngram_stats (
+    ngram TEXT PRIMARY KEY,
+    attempts INTEGER DEFAULT 0,
+    errors INTEGER DEFAULT 0,
+    timed INTEGER DEFAULT 0,
+    total_time REAL DEFAULT 0
+)
+""")
 conn.commit()
 
 class TypingSpeedTest:
@@ -68,6 +78,13 @@ class TypingSpeedTest:
         self.test_duration = 0
         self.caps_lock_on = False
         self.dark_mode = False
+        self.key_times = []
+        self.pending_key_times = []
+        
+        # Adaptive practice: per-user n-gram stats and n-gram -> passage index
+        self.adaptive_var = tk.BooleanVar(value=False)
+        self.ngram_stats = self.load_ngram_stats()
+        self.ngram_index = self.build_ngram_index()
         
         # Create GUI
         self.create_widgets()
@@ -134,6 +151,8 @@ class TypingSpeedTest:
                   command=lambda: self.set_custom_test('random')).pack(fill=tk.X, pady=2)
         ttk.Button(custom_frame, text="Custom Text", 
                   command=lambda: self.set_custom_test('custom')).pack(fill=tk.X, pady=2)
+        ttk.Checkbutton(custom_frame, text="Adaptive Practice", variable=self.adaptive_var,
+                       command=self.toggle_adaptive).pack(anchor=tk.W, pady=2)
         
         # Statistics
         stats_frame = ttk.LabelFrame(left_panel, text="Statistics")
@@ -171,6 +190,7 @@ class TypingSpeedTest:
         
         self.typing_entry.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar2.pack(side=tk.RIGHT, fill=tk.Y)
+        self.typing_entry.bind("<KeyPress>", self.record_keypress)
         self.typing_entry.bind("<KeyRelease>", self.check_typing)
         
         # Results display
@@ -244,6 +264,12 @@ class TypingSpeedTest:
         else:
             self.caps_lock_label.pack_forget()
     
+    def toggle_adaptive(self):
+        """Pick an adaptive passage when adaptive practice is turned on."""
+        # A running test keeps its passage; save_result picks the next one
+        if self.adaptive_var.get() and not self.running:
+            self.generate_sample_text()
+    
     def change_difficulty(self):
         """Change the difficulty level and generate new text."""
         self.current_difficulty = self.diff_var.get()
@@ -252,9 +278,192 @@ class TypingSpeedTest:
     def generate_sample_text(self):
         """Generate sample text based on current difficulty."""
         texts = self.sample_texts[self.current_difficulty]
-        self.sample_text = random.choice(texts)
+        adaptive_text = self.pick_adaptive_text() if self.adaptive_var.get() else None
+        self.sample_text = adaptive_text or random.choice(texts)
         self.display_sample_text()
     
+    @staticmethod
+    def extract_ngrams(text):
+        """Return the lowercase characters and bigrams of a text, in order."""
+        text = text.lower()
+        return list(text) + [text[i:i + 2] for i in range(len(text) - 1)]
+    
+    def build_ngram_index(self):
+        """Build an inverted index of n-gram -> [(density, passage)] per difficulty.
+        
+        Each posting list is sorted densest first, so a query can stop after
+        the head of the list.
+        """
+        index = {}
+        for difficulty, texts in self.sample_texts.items():
+            counts = {}
+            for passage_id, text in enumerate(texts):
+                for ngram in self.extract_ngrams(text):
+                    passages = counts.setdefault(ngram, {})
+                    passages[passage_id] = passages.get(passage_id, 0) + 1
+            index[difficulty] = {
+                ngram: sorted(((count / len(texts[pid]), pid) for pid, count in passages.items()),
+                              reverse=True)
+                for ngram, passages in counts.items()
+            }
+        return index
+    
+    def load_ngram_stats(self):
+        """Load per-n-gram attempt, error and timing totals from the database."""
+        cursor.execute("SELECT ngram, attempts, errors, timed, total_time FROM ngram_stats")
+        return {row[0]: list(row[1:]) for row in cursor.fetchall()}
+    
+    @staticmethod
+    def align_typed(sample, typed, lookahead=5):
+        """Align typed text to the sample so one slip doesn't shift the rest.
+        
+        Only the first len(typed) + lookahead sample characters are searched,
+        so a stray keystroke near the end can't match text far ahead.
+        
+        Returns (matched, correct, attempted): the typed index of each sample
+        character (or None), whether it was typed correctly, and how many
+        leading sample characters the user actually got to.
+        """
+        window = sample[:len(typed) + lookahead]
+        matcher = difflib.SequenceMatcher(None, window, typed, autojunk=False)
+        matched = [None] * len(sample)
+        correct = [False] * len(sample)
+        extra = set()
+        attempted = 0
+        
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                for k in range(i2 - i1):
+                    matched[i1 + k] = j1 + k
+                    correct[i1 + k] = True
+            elif tag == 'insert':
+                # An extra keystroke counts against the character it preceded
+                extra.add(i1)
+            # A trailing delete is the untyped rest of the passage, and a
+            # replace covers no more sample characters than were typed
+            if tag == 'replace':
+                attempted = i1 + min(i2 - i1, j2 - j1)
+            elif tag != 'delete':
+                attempted = i2
+        
+        for i in extra:
+            if i < len(sample):
+                correct[i] = False
+        return matched, correct, attempted
+    
+    def update_ngram_stats(self, max_interval=2.0):
+        """Fold the n-grams of the finished test into the stored stats.
+        
+        Intervals longer than max_interval seconds are pauses, not slow keys,
+        and are left out of the timing totals.
+        """
+        sample = self.sample_text
+        matched, correct, attempted = self.align_typed(sample, self.typed_text)
+        deltas = {}
+        
+        for i in range(attempted):
+            # Time between the previous keystroke and this one, only when
+            # both characters were typed correctly and back to back
+            interval = None
+            j = matched[i]
+            if (i > 0 and correct[i] and correct[i - 1] and matched[i - 1] == j - 1
+                    and j < len(self.key_times)):
+                interval = self.key_times[j] - self.key_times[j - 1]
+                if interval > max_interval:
+                    interval = None
+            
+            # Characters and bigrams ending at position i
+            for start in (i, i - 1):
+                if start < 0:
+                    continue
+                delta = deltas.setdefault(sample[start:i + 1].lower(), [0, 0, 0, 0.0])
+                delta[0] += 1
+                if not all(correct[start:i + 1]):
+                    delta[1] += 1
+                if interval is not None:
+                    delta[2] += 1
+                    delta[3] += interval
+        
+        for ngram, delta in deltas.items():
+            stats = self.ngram_stats.setdefault(ngram, [0, 0, 0, 0.0])
+            for j in range(4):
+                stats[j] += delta[j]
+        
+        cursor.executemany("""
+            INSERT INTO ngram_stats (ngram, attempts, errors, timed, total_time)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(ngram) DO UPDATE SET
+                attempts = attempts + excluded.attempts,
+                errors = errors + excluded.errors,
+                timed = timed + excluded.timed,
+                total_time = total_time + excluded.total_time
+        """, [(ngram, *delta) for ngram, delta in deltas.items()])
+        conn.commit()
+    
+    def weak_ngrams(self, limit=20, min_attempts=3):
+        """Return the user's weakest n-grams as {ngram: weight}."""
+        timed = sum(s[2] for n, s in self.ngram_stats.items() if len(n) == 1)
+        total_time = sum(s[3] for n, s in self.ngram_stats.items() if len(n) == 1)
+        avg_time = total_time / timed if timed > 0 else 0
+        
+        weights = {}
+        for ngram, (attempts, errors, ngram_timed, ngram_time) in self.ngram_stats.items():
+            if attempts < min_attempts or ngram.isspace():
+                continue
+            weight = errors / attempts
+            # Penalize keys that are slower than the user's average keystroke,
+            # capped at 1.0 (twice the average) to match the error rate's scale
+            if avg_time > 0 and ngram_timed > 0:
+                slowness = (ngram_time / ngram_timed) / avg_time - 1
+                weight += min(1.0, max(0.0, slowness))
+            if weight > 0:
+                weights[ngram] = weight
+        
+        top = sorted(weights, key=weights.get, reverse=True)[:limit]
+        return {ngram: weights[ngram] for ngram in top}
+    
+    def rank_passages(self, weak, top_k=5, max_postings=200, max_df=0.5):
+        """Rank passages of the current difficulty by density of weak n-grams.
+        
+        N-grams found in more than max_df of the passages are skipped, and
+        only the first max_postings entries of each posting list are read,
+        so the cost of a query doesn't grow with the corpus.
+        
+        Returns up to top_k (score, passage_id) pairs, best first, leaving
+        out the passage currently on screen.
+        """
+        texts = self.sample_texts[self.current_difficulty]
+        postings = self.ngram_index[self.current_difficulty]
+        scores = {}
+        for ngram, weight in weak.items():
+            posting = postings.get(ngram)
+            # Common n-grams like 'th' or 'e' don't help choose a passage
+            if not posting or len(posting) > max_df * len(texts):
+                continue
+            idf = math.log(len(texts) / len(posting))
+            for density, passage_id in posting[:max_postings]:
+                scores[passage_id] = scores.get(passage_id, 0) + weight * idf * density
+        
+        ranked = heapq.nlargest(top_k + 1, ((score, pid) for pid, score in scores.items()))
+        return [(score, pid) for score, pid in ranked if texts[pid] != self.sample_text][:top_k]
+    
+    def pick_adaptive_text(self):
+        """Pick a passage heavy in the user's weak n-grams, or None."""
+        weak = self.weak_ngrams()
+        
+        # Bigrams tell passages apart better than single characters, so only
+        # fall back to characters when no weak bigram is rare enough to use
+        ranked = self.rank_passages({n: w for n, w in weak.items() if len(n) == 2})
+        if not ranked:
+            ranked = self.rank_passages({n: w for n, w in weak.items() if len(n) == 1})
+        if not ranked:
+            return None
+        
+        # Sample the top passages in proportion to score so they don't just alternate
+        scores = [score for score, _ in ranked]
+        passage_id = random.choices([pid for _, pid in ranked], weights=scores)[0]
+        return self.sample_texts[self.current_difficulty][passage_id]
+    
     def display_sample_text(self):
         """Display the sample text in the text widget."""
         self.sample_text_display.config(state=tk.NORMAL)
@@ -289,6 +498,8 @@ class TypingSpeedTest:
             self.running = True
             self.start_time = time.time()
             self.typed_text = ""
+            self.key_times = []
+            self.pending_key_times = []
             self.typing_entry.delete(1.0, tk.END)
             self.reset_btn.config(state=tk.NORMAL)
             self.progress['value'] = 0
@@ -299,6 +510,8 @@ class TypingSpeedTest:
         self.running = False
         self.start_time = None
         self.typed_text = ""
+        self.key_times = []
+        self.pending_key_times = []
         self.typing_entry.delete(1.0, tk.END)
         self.reset_btn.config(state=tk.DISABLED)
         self.wpm_label.config(text="WPM: 0")
@@ -315,6 +528,11 @@ class TypingSpeedTest:
             self.time_label.config(text=f"Time: {elapsed:.1f}s")
             self.timer_id = self.root.after(100, self.update_timer)
     
+    def record_keypress(self, event):
+        """Timestamp printable keystrokes when they are pressed."""
+        if self.running and event.char and event.char.isprintable():
+            self.pending_key_times.append(time.time())
+    
     def check_typing(self, event):
         """Check the user's typing against the sample text."""
         if not self.running:
@@ -323,6 +541,17 @@ class TypingSpeedTest:
         self.typed_text = self.typing_entry.get(1.0, tk.END).strip()
         self.end_time = time.time()
         
+        # Track when each character position was typed (for slow-key stats).
+        # Several keys can be pressed before one release, so new characters
+        # take their press timestamps rather than this release's time.
+        del self.key_times[len(self.typed_text):]
+        new_chars = len(self.typed_text) - len(self.key_times)
+        if new_chars > 0:
+            self.key_times.extend(self.pending_key_times[-new_chars:])
+        while len(self.key_times) < len(self.typed_text):
+            self.key_times.append(self.end_time)
+        self.pending_key_times = []
+        
         # Calculate test duration
         self.test_duration = self.end_time - self.start_time
         
@@ -370,6 +599,7 @@ class TypingSpeedTest:
             (wpm, accuracy, self.test_duration, len(self.sample_text), self.current_difficulty)
         )
         conn.commit()
+        self.update_ngram_stats()
         
         # Show results
         result_str = f"Test Complete!\n\nWPM: {wpm:.1f}\nAccuracy: {accuracy:.1f}%\n"
@@ -377,6 +607,10 @@ class TypingSpeedTest:
         
         messagebox.showinfo("Results", result_str)
         self.update_stats()
+        
+        # Serve the next passage based on the updated weak n-grams
+        if self.adaptive_var.get():
+            self.generate_sample_text()
     
     def update_stats(self):
         """Update statistics display with database results."""
@@ -498,6 +732,9 @@ class TypingSpeedTest:
     
     def show_progress(self):
         """Show a progress chart of WPM over time."""
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        
         cursor.execute("SELECT timestamp, wpm, difficulty FROM results ORDER BY timestamp")
         results = cursor.fetchall()
         
@@ -640,6 +877,7 @@ class TypingSpeedTest:
         Features:
         - Multiple difficulty levels
         - Custom text options
+        - Adaptive practice targeting your weak keys
         - Progress tracking
         - Detailed statistics
         - Dark/light theme